@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+One-time migration: convert ISO-string datetimes to native BSON dates
+Documents written before dates were stored natively keep them as strings
+"""
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pathlib import Path
+import os
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Datetime fields per collection
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "sessions": ["expires_at", "created_at"],
+    "categories": ["created_at"],
+    "transactions": ["date", "created_at"],
+    "goals": ["deadline", "created_at"],
+}
+
+def main():
+    """Convert string dates in place, server-side"""
+    client = MongoClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    for collection, fields in DATE_FIELDS.items():
+        for field in fields:
+            # Unparseable strings are left in place instead of aborting the pass
+            result = db[collection].update_many(
+                {field: {"$type": "string"}},
+                [{"$set": {field: {"$dateFromString": {
+                    "dateString": f"${field}",
+                    "onError": f"${field}"
+                }}}}]
+            )
+            remaining = db[collection].count_documents({field: {"$type": "string"}})
+            print(f"{collection}.{field}: {result.modified_count} documents converted, "
+                  f"{remaining} left as strings")
+
+    client.close()
+
+if __name__ == "__main__":
+    main()
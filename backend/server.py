@@ -1,34 +1,63 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Response, Cookie
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, Cookie
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import OperationFailure
 import os
 import logging
 import httpx
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Annotated, List, Optional
 import uuid
+import base64
+import hashlib
+import secrets
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+from functools import lru_cache
+from cachetools import TTLCache
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+import orjson
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncMongoClient(
+    mongo_url,
+    tz_aware=True,
+    tzinfo=timezone.utc,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', 200)),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 20)),
+    maxIdleTimeMS=60000,
+    socketTimeoutMS=20000,
+    serverSelectionTimeoutMS=3000,
+    compressors="zstd,snappy",
+    uuidRepresentation="standard"
+)
 db = client[os.environ['DB_NAME']]
 
+# Optional Redis cache shared by all workers, enabled by REDIS_URL
+redis_url = os.environ.get('REDIS_URL')
+redis_client = Redis.from_url(redis_url) if redis_url else None
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Security
-security = HTTPBearer(auto_error=False)
+# Lifetime of a login session
+SESSION_LIFETIME = timedelta(days=7)
+
+# Resolved sessions keyed by token hash, so authenticated requests skip the
+# sessions/users lookups while the entry is fresh. Without Redis, a logout on
+# another worker is only seen here once the entry expires (60s at most)
+session_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
 
 # Enums
 class TransactionType(str, Enum):
@@ -56,7 +85,7 @@ class UserCreate(BaseModel):
 class Session(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
-    session_token: str
+    token_hash: bytes
     expires_at: datetime
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -84,6 +113,10 @@ class Transaction(BaseModel):
     date: datetime
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
 class TransactionCreate(BaseModel):
     amount: float
     type: TransactionType
@@ -115,49 +148,191 @@ class MonthlyReport(BaseModel):
     transactions_count: int
     top_categories: List[dict]
 
+# Categories created for every new user
+DEFAULT_CATEGORIES = (
+    {"name": "Alimentação", "color": "#EF4444", "icon": "🍽️", "is_default": True},
+    {"name": "Transporte", "color": "#3B82F6", "icon": "🚗", "is_default": True},
+    {"name": "Moradia", "color": "#8B5CF6", "icon": "🏠", "is_default": True},
+    {"name": "Saúde", "color": "#10B981", "icon": "⚕️", "is_default": True},
+    {"name": "Educação", "color": "#F59E0B", "icon": "📚", "is_default": True},
+    {"name": "Entretenimento", "color": "#EC4899", "icon": "🎬", "is_default": True},
+    {"name": "Salário", "color": "#22C55E", "icon": "💰", "is_default": True},
+    {"name": "Investimentos", "color": "#6366F1", "icon": "📈", "is_default": True},
+)
+
 # Helper functions
-def prepare_for_mongo(data):
-    """Prepare data for MongoDB storage"""
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
-    return data
-
-def parse_from_mongo(item):
-    """Parse data from MongoDB"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if key.endswith('_at') or key == 'date' or key == 'deadline':
-                if isinstance(value, str):
-                    try:
-                        item[key] = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                    except:
-                        pass
-    return item
+@lru_cache(maxsize=256)
+def month_bounds(year, month):
+    """UTC start (inclusive) and end (exclusive) of a calendar month"""
+    start_date = datetime(year, month, 1, tzinfo=timezone.utc)
+    end_date = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start_date, end_date
+
+def hash_token(token):
+    """BLAKE2b digest of a session token; only the digest is stored"""
+    return hashlib.blake2b(token.encode(), digest_size=32).digest()
+
+async def get_cached_session(token_hash):
+    """Fetch a resolved (user, expires_at) session from the caches, rejecting revoked tokens
+    
+    With Redis configured, the shared revoked marker is read before the in-process
+    entry is trusted, so a logout on one worker applies to every worker at once
+    """
+    local = session_cache.get(token_hash)
+    if redis_client is None:
+        return local
+    try:
+        raw, revoked = await redis_client.mget(f"sess:{token_hash.hex()}", f"revoked:{token_hash.hex()}")
+    except RedisError as e:
+        logger.warning(f"Session cache read failed: {e}")
+        return local
+    if revoked:
+        session_cache.pop(token_hash, None)
+        raise HTTPException(status_code=401, detail="Session revoked")
+    if local:
+        return local
+    if not raw:
+        return None
+    data = orjson.loads(raw)
+    session = User.model_validate(data["user"]), datetime.fromisoformat(data["expires_at"])
+    # Only fresh reads populate the local cache; rewriting an existing entry
+    # would restart its TTL on every hit
+    session_cache[token_hash] = session
+    return session
+
+async def set_cached_session(token_hash, user, expires_at):
+    """Store a resolved session in Redis until it expires, for at most 5 minutes"""
+    session_cache[token_hash] = (user, expires_at)
+    if redis_client is None:
+        return
+    ttl = min(int((expires_at - datetime.now(timezone.utc)).total_seconds()), 300)
+    if ttl <= 0:
+        return
+    payload = orjson.dumps({"user": user.model_dump(), "expires_at": expires_at})
+    try:
+        await redis_client.set(f"sess:{token_hash.hex()}", payload, ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Session cache write failed: {e}")
+
+async def drop_cached_session(token_hash):
+    """Forget a session and mark its token revoked, so later uses skip MongoDB"""
+    session_cache.pop(token_hash, None)
+    if redis_client is None:
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.delete(f"sess:{token_hash.hex()}")
+            pipe.setex(f"revoked:{token_hash.hex()}", SESSION_LIFETIME, 1)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Session cache delete failed: {e}")
+
+async def get_cached_report(user_id, year, month):
+    """Fetch a cached monthly report and the user's report version from Redis
+    
+    Each write bumps the version, so a report computed before a concurrent write
+    is tagged with an older version and never served
+    """
+    if redis_client is None:
+        return None, None
+    try:
+        version, raw = await redis_client.hmget(f"report:{user_id}", "ver", f"{year}-{month:02d}")
+    except RedisError as e:
+        logger.warning(f"Report cache read failed: {e}")
+        return None, None
+    version = int(version or 0)
+    if raw:
+        stored_version, _, payload = raw.partition(b"|")
+        if int(stored_version) == version:
+            return MonthlyReport.model_validate_json(payload), version
+    return None, version
+
+async def set_cached_report(user_id, report, version):
+    """Store a monthly report under the version it was computed at"""
+    if redis_client is None or version is None:
+        return
+    key = f"report:{user_id}"
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(key, f"{report.year}-{report.month}", f"{version}|{report.model_dump_json()}")
+            pipe.expire(key, 24 * 60 * 60)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Report cache write failed: {e}")
+
+async def drop_cached_reports(user_id):
+    """Invalidate every cached report of a user after a write that can change them"""
+    if redis_client is None:
+        return
+    key = f"report:{user_id}"
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(key, "ver", 1)
+            pipe.expire(key, 24 * 60 * 60)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Report cache invalidation failed: {e}")
 
 # Authentication functions
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), session_token: str = Cookie(None)):
-    token = None
-    if session_token:
-        token = session_token
-    elif credentials:
-        token = credentials.credentials
+async def get_current_user(request: Request):
+    # Session cookie first, then an "Authorization: Bearer <token>" header
+    token = request.cookies.get("session_token")
+    if not token:
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and credentials:
+            token = credentials
     
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
+    token_hash = hash_token(token)
+    
+    cached = await get_cached_session(token_hash)
+    if cached:
+        user, expires_at = cached
+        if expires_at >= datetime.now(timezone.utc):
+            return user
+        session_cache.pop(token_hash, None)
     
-    # Find session in database
-    session = await db.sessions.find_one({"session_token": token})
-    if not session or datetime.fromisoformat(session['expires_at']) < datetime.now(timezone.utc):
+    # Find session and its user in a single round-trip
+    pipeline = [
+        {"$match": {"token_hash": token_hash}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "id",
+            "as": "user"
+        }},
+        {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "expires_at": 1,
+            "user.id": 1,
+            "user.email": 1,
+            "user.name": 1,
+            "user.picture": 1,
+            "user.created_at": 1
+        }}
+    ]
+    cursor = await db.sessions.aggregate(pipeline)
+    sessions = await cursor.to_list(1)
+    if not sessions:
+        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    session = sessions[0]
+    expires_at = session['expires_at']
+    if expires_at < datetime.now(timezone.utc):
+        await drop_cached_session(token_hash)
         raise HTTPException(status_code=401, detail="Invalid or expired session")
     
-    # Get user
-    user = await db.users.find_one({"id": session['user_id']})
+    user = session.get('user')
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return User(**parse_from_mongo(user))
+    current_user = User.model_validate(user)
+    await set_cached_session(token_hash, current_user, expires_at)
+    return current_user
+
+CurrentUser = Annotated[User, Depends(get_current_user)]
 
 # Routes
 
@@ -169,75 +344,60 @@ async def health_check():
 # Authentication
 @api_router.post("/auth/callback")
 async def auth_callback(session_id: str, response: Response):
+    now = datetime.now(timezone.utc)
     try:
         # Call Emergent auth API
-        async with httpx.AsyncClient() as client:
-            auth_response = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": session_id}
-            )
-            auth_response.raise_for_status()
-            auth_data = auth_response.json()
+        auth_response = await app.state.http.get(
+            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
+            headers={"X-Session-ID": session_id}
+        )
+        auth_response.raise_for_status()
+        auth_data = auth_response.json()
         
         # Check if user exists
-        existing_user = await db.users.find_one({"email": auth_data["email"]})
+        existing_user = await db.users.find_one({"email": auth_data["email"]}, {"_id": 0})
         
         if not existing_user:
             # Create new user
-            user_data = {
-                "id": str(uuid.uuid4()),
-                "email": auth_data["email"],
-                "name": auth_data["name"],
-                "picture": auth_data.get("picture"),
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            await db.users.insert_one(user_data)
+            user = User(
+                email=auth_data["email"],
+                name=auth_data["name"],
+                picture=auth_data.get("picture"),
+                created_at=now
+            )
+            await db.users.insert_one(user.model_dump())
             
             # Create default categories
-            default_categories = [
-                {"name": "Alimentação", "color": "#EF4444", "icon": "🍽️", "is_default": True},
-                {"name": "Transporte", "color": "#3B82F6", "icon": "🚗", "is_default": True},
-                {"name": "Moradia", "color": "#8B5CF6", "icon": "🏠", "is_default": True},
-                {"name": "Saúde", "color": "#10B981", "icon": "⚕️", "is_default": True},
-                {"name": "Educação", "color": "#F59E0B", "icon": "📚", "is_default": True},
-                {"name": "Entretenimento", "color": "#EC4899", "icon": "🎬", "is_default": True},
-                {"name": "Salário", "color": "#22C55E", "icon": "💰", "is_default": True},
-                {"name": "Investimentos", "color": "#6366F1", "icon": "📈", "is_default": True}
+            categories = [
+                Category(user_id=user.id, created_at=now, **cat_data).model_dump()
+                for cat_data in DEFAULT_CATEGORIES
             ]
-            
-            for cat_data in default_categories:
-                category = {
-                    "id": str(uuid.uuid4()),
-                    "user_id": user_data["id"],
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                    **cat_data
-                }
-                await db.categories.insert_one(category)
+            await db.categories.insert_many(categories, ordered=False)
         else:
-            user_data = existing_user
+            user = User.model_validate(existing_user)
         
-        # Create session
-        session_data = {
-            "id": str(uuid.uuid4()),
-            "user_id": user_data["id"],
-            "session_token": auth_data["session_token"],
-            "expires_at": (datetime.now(timezone.utc) + timedelta(days=7)).isoformat(),
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.sessions.insert_one(session_data)
+        # Create session; the cookie carries the token, the database only its hash
+        session_token = secrets.token_urlsafe(32)
+        session = Session(
+            user_id=user.id,
+            token_hash=hash_token(session_token),
+            expires_at=now + SESSION_LIFETIME,
+            created_at=now
+        )
+        await db.sessions.insert_one(session.model_dump())
         
         # Set cookie
         response.set_cookie(
             key="session_token",
-            value=auth_data["session_token"],
-            max_age=7 * 24 * 60 * 60,  # 7 days
+            value=session_token,
+            max_age=int(SESSION_LIFETIME.total_seconds()),
             httponly=True,
             secure=True,
             samesite="none",
             path="/"
         )
         
-        return {"success": True, "user": User(**parse_from_mongo(user_data))}
+        return {"success": True, "user": user}
         
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=400, detail=f"Auth failed: {e}")
@@ -245,111 +405,139 @@ async def auth_callback(session_id: str, response: Response):
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
 @api_router.get("/auth/me", response_model=User)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: CurrentUser):
     return current_user
 
 @api_router.post("/auth/logout")
 async def logout(response: Response, session_token: str = Cookie(None)):
     if session_token:
-        await db.sessions.delete_many({"session_token": session_token})
+        token_hash = hash_token(session_token)
+        await drop_cached_session(token_hash)
+        await db.sessions.delete_many({"token_hash": token_hash})
     response.delete_cookie(key="session_token", path="/")
     return {"success": True}
 
 # Categories
-@api_router.get("/categories", response_model=List[Category])
-async def get_categories(current_user: User = Depends(get_current_user)):
-    categories = await db.categories.find({"user_id": current_user.id}).to_list(1000)
-    return [Category(**parse_from_mongo(cat)) for cat in categories]
+@api_router.get("/categories", responses={200: {"model": List[Category]}})
+async def get_categories(current_user: CurrentUser):
+    # Documents come from our own writes, so they are serialized as stored
+    cursor = db.categories.find({"user_id": current_user.id}, {"_id": 0}).limit(1000)
+    return ORJSONResponse(await cursor.to_list())
 
 @api_router.post("/categories", response_model=Category)
-async def create_category(category_data: CategoryCreate, current_user: User = Depends(get_current_user)):
-    category_dict = category_data.dict()
+async def create_category(category_data: CategoryCreate, current_user: CurrentUser):
+    category_dict = category_data.model_dump()
     category_dict["user_id"] = current_user.id
     category_obj = Category(**category_dict)
-    category_mongo = prepare_for_mongo(category_obj.dict())
-    await db.categories.insert_one(category_mongo)
+    await db.categories.insert_one(category_obj.model_dump())
     return category_obj
 
 @api_router.delete("/categories/{category_id}")
-async def delete_category(category_id: str, current_user: User = Depends(get_current_user)):
+async def delete_category(category_id: str, current_user: CurrentUser):
     result = await db.categories.delete_one({"id": category_id, "user_id": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await drop_cached_reports(current_user.id)
     return {"success": True}
 
 # Transactions
-@api_router.get("/transactions", response_model=List[Transaction])
-async def get_transactions(current_user: User = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user.id}).sort("date", -1).to_list(1000)
-    return [Transaction(**parse_from_mongo(txn)) for txn in transactions]
+@api_router.get("/transactions", responses={200: {"model": TransactionPage}})
+async def get_transactions(current_user: CurrentUser, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=200)):
+    # Keyset pagination, newest first; the cursor is "<date>|<id>" of the last item
+    # seen, base64url-encoded so it can be put in a URL as-is
+    query = {"user_id": current_user.id}
+    if cursor:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            before_date, _, before_id = raw.rpartition("|")
+            before_date = datetime.fromisoformat(before_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query["$or"] = [
+            {"date": {"$lt": before_date}},
+            {"date": before_date, "id": {"$lt": before_id}}
+        ]
+    
+    items = await db.transactions.find(query, {"_id": 0}).sort([("date", -1), ("id", -1)]).limit(limit).to_list()
+    next_cursor = None
+    if len(items) == limit:
+        raw = f"{items[-1]['date'].isoformat()}|{items[-1]['id']}"
+        next_cursor = base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
 
 @api_router.post("/transactions", response_model=Transaction)
-async def create_transaction(transaction_data: TransactionCreate, current_user: User = Depends(get_current_user)):
-    transaction_dict = transaction_data.dict()
+async def create_transaction(transaction_data: TransactionCreate, current_user: CurrentUser):
+    transaction_dict = transaction_data.model_dump()
     transaction_dict["user_id"] = current_user.id
     transaction_obj = Transaction(**transaction_dict)
-    transaction_mongo = prepare_for_mongo(transaction_obj.dict())
-    await db.transactions.insert_one(transaction_mongo)
+    await db.transactions.insert_one(transaction_obj.model_dump())
+    await drop_cached_reports(current_user.id)
     return transaction_obj
 
 @api_router.put("/transactions/{transaction_id}", response_model=Transaction)
-async def update_transaction(transaction_id: str, transaction_data: TransactionCreate, current_user: User = Depends(get_current_user)):
-    transaction_dict = transaction_data.dict()
+async def update_transaction(transaction_id: str, transaction_data: TransactionCreate, current_user: CurrentUser):
+    transaction_dict = transaction_data.model_dump()
     transaction_dict["user_id"] = current_user.id
-    transaction_mongo = prepare_for_mongo(transaction_dict)
     
-    result = await db.transactions.update_one(
+    updated_transaction = await db.transactions.find_one_and_update(
         {"id": transaction_id, "user_id": current_user.id},
-        {"$set": transaction_mongo}
+        {"$set": transaction_dict},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if not updated_transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    await drop_cached_reports(current_user.id)
     
-    updated_transaction = await db.transactions.find_one({"id": transaction_id})
-    return Transaction(**parse_from_mongo(updated_transaction))
+    return Transaction.model_validate(updated_transaction)
 
 @api_router.delete("/transactions/{transaction_id}")
-async def delete_transaction(transaction_id: str, current_user: User = Depends(get_current_user)):
+async def delete_transaction(transaction_id: str, current_user: CurrentUser):
     result = await db.transactions.delete_one({"id": transaction_id, "user_id": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    await drop_cached_reports(current_user.id)
     return {"success": True}
 
 # Goals
-@api_router.get("/goals", response_model=List[Goal])
-async def get_goals(current_user: User = Depends(get_current_user)):
-    goals = await db.goals.find({"user_id": current_user.id}).to_list(1000)
-    return [Goal(**parse_from_mongo(goal)) for goal in goals]
+@api_router.get("/goals", responses={200: {"model": List[Goal]}})
+async def get_goals(current_user: CurrentUser):
+    cursor = db.goals.find({"user_id": current_user.id}, {"_id": 0}).limit(1000)
+    return ORJSONResponse(await cursor.to_list())
 
 @api_router.post("/goals", response_model=Goal)
-async def create_goal(goal_data: GoalCreate, current_user: User = Depends(get_current_user)):
-    goal_dict = goal_data.dict()
+async def create_goal(goal_data: GoalCreate, current_user: CurrentUser):
+    goal_dict = goal_data.model_dump()
     goal_dict["user_id"] = current_user.id
     goal_obj = Goal(**goal_dict)
-    goal_mongo = prepare_for_mongo(goal_obj.dict())
-    await db.goals.insert_one(goal_mongo)
+    await db.goals.insert_one(goal_obj.model_dump())
     return goal_obj
 
 @api_router.put("/goals/{goal_id}/add-amount")
-async def add_to_goal(goal_id: str, amount: float, current_user: User = Depends(get_current_user)):
-    goal = await db.goals.find_one({"id": goal_id, "user_id": current_user.id})
-    if not goal:
-        raise HTTPException(status_code=404, detail="Goal not found")
-    
-    new_amount = goal.get("current_amount", 0) + amount
-    status = GoalStatus.COMPLETED if new_amount >= goal["target_amount"] else GoalStatus.ACTIVE
-    
-    await db.goals.update_one(
+async def add_to_goal(goal_id: str, amount: float, current_user: CurrentUser):
+    # Add and re-evaluate the status in one atomic pipeline update
+    new_amount = {"$add": [{"$ifNull": ["$current_amount", 0]}, amount]}
+    updated_goal = await db.goals.find_one_and_update(
         {"id": goal_id, "user_id": current_user.id},
-        {"$set": {"current_amount": new_amount, "status": status}}
+        [{"$set": {
+            "current_amount": new_amount,
+            "status": {"$cond": [
+                {"$gte": [new_amount, "$target_amount"]},
+                GoalStatus.COMPLETED.value,
+                GoalStatus.ACTIVE.value
+            ]}
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_goal:
+        raise HTTPException(status_code=404, detail="Goal not found")
     
-    updated_goal = await db.goals.find_one({"id": goal_id})
-    return Goal(**parse_from_mongo(updated_goal))
+    return Goal.model_validate(updated_goal)
 
 @api_router.delete("/goals/{goal_id}")
-async def delete_goal(goal_id: str, current_user: User = Depends(get_current_user)):
+async def delete_goal(goal_id: str, current_user: CurrentUser):
     result = await db.goals.delete_one({"id": goal_id, "user_id": current_user.id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Goal not found")
@@ -357,59 +545,75 @@ async def delete_goal(goal_id: str, current_user: User = Depends(get_current_use
 
 # Reports
 @api_router.get("/reports/monthly/{year}/{month}", response_model=MonthlyReport)
-async def get_monthly_report(year: int, month: int, current_user: User = Depends(get_current_user)):
+async def get_monthly_report(year: int, month: int, current_user: CurrentUser):
+    cached, version = await get_cached_report(current_user.id, year, month)
+    if cached:
+        return cached
+    
     # Date range for the month
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
+    start_date, end_date = month_bounds(year, month)
     
-    # Get transactions for the month
-    transactions = await db.transactions.find({
-        "user_id": current_user.id,
-        "date": {
-            "$gte": start_date.isoformat(),
-            "$lt": end_date.isoformat()
-        }
-    }).to_list(1000)
+    # Totals and top expense categories for the month in a single pipeline
+    pipeline = [
+        {"$match": {
+            "user_id": current_user.id,
+            "date": {
+                "$gte": start_date,
+                "$lt": end_date
+            }
+        }},
+        {"$facet": {
+            "totals": [
+                {"$group": {"_id": "$type", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}}
+            ],
+            "top_categories": [
+                {"$match": {"type": "expense"}},
+                {"$group": {"_id": "$category_id", "amount": {"$sum": "$amount"}}},
+                {"$sort": {"amount": -1}},
+                {"$limit": 5},
+                # Scoped to the user so the (user_id, id) index serves the join
+                {"$lookup": {
+                    "from": "categories",
+                    "let": {"category_id": "$_id"},
+                    "pipeline": [
+                        {"$match": {
+                            "user_id": current_user.id,
+                            "$expr": {"$eq": ["$id", "$$category_id"]}
+                        }},
+                        {"$project": {"_id": 0, "name": 1, "color": 1}}
+                    ],
+                    "as": "category"
+                }},
+                {"$unwind": "$category"},
+                {"$project": {
+                    "_id": 0,
+                    "category": "$category.name",
+                    "amount": 1,
+                    "color": "$category.color"
+                }}
+            ]
+        }}
+    ]
+    cursor = await db.transactions.aggregate(pipeline)
+    result = (await cursor.to_list(1))[0]
     
     # Calculate totals
-    total_income = sum(t["amount"] for t in transactions if t["type"] == "income")
-    total_expenses = sum(t["amount"] for t in transactions if t["type"] == "expense")
-    
-    # Get categories
-    categories = await db.categories.find({"user_id": current_user.id}).to_list(1000)
-    cat_dict = {cat["id"]: cat for cat in categories}
+    totals = {group["_id"]: group for group in result["totals"]}
+    total_income = totals.get("income", {}).get("amount", 0)
+    total_expenses = totals.get("expense", {}).get("amount", 0)
+    transactions_count = sum(group["count"] for group in result["totals"])
     
-    # Top categories
-    category_totals = {}
-    for txn in transactions:
-        if txn["type"] == "expense":
-            cat_id = txn["category_id"]
-            if cat_id in category_totals:
-                category_totals[cat_id] += txn["amount"]
-            else:
-                category_totals[cat_id] = txn["amount"]
-    
-    top_categories = []
-    for cat_id, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True)[:5]:
-        if cat_id in cat_dict:
-            top_categories.append({
-                "category": cat_dict[cat_id]["name"],
-                "amount": amount,
-                "color": cat_dict[cat_id]["color"]
-            })
-    
-    return MonthlyReport(
+    report = MonthlyReport(
         month=f"{month:02d}",
         year=year,
         total_income=total_income,
         total_expenses=total_expenses,
         balance=total_income - total_expenses,
-        transactions_count=len(transactions),
-        top_categories=top_categories
+        transactions_count=transactions_count,
+        top_categories=result["top_categories"]
     )
+    await set_cached_report(current_user.id, report, version)
+    return report
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -429,6 +633,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_indexes():
+    # Sessions are looked up by token hash; raw-token sessions can no longer
+    # be matched and would all index as null under the unique index
+    await db.sessions.delete_many({"token_hash": {"$exists": False}})
+    try:
+        await db.sessions.drop_index("session_token_1")
+    except OperationFailure as e:
+        # Already gone, possibly dropped by another worker starting alongside
+        if e.code != 27:  # IndexNotFound
+            raise
+    await db.sessions.create_index("token_hash", unique=True)
+    await db.users.create_index("email", unique=True)
+    await db.users.create_index("id", unique=True)
+    await db.categories.create_index([("user_id", 1), ("id", 1)])
+    await db.transactions.create_index([("user_id", 1), ("date", -1), ("id", -1)])
+    await db.transactions.create_index([("user_id", 1), ("id", 1)])
+    await db.goals.create_index([("user_id", 1), ("id", 1)])
+
+@app.on_event("startup")
+async def startup_http_client():
+    # Shared HTTP client for outbound auth calls
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await client.close()
+    await app.state.http.aclose()
+    if redis_client is not None:
+        await redis_client.aclose()
\ No newline at end of file
@@ -4,84 +4,163 @@ Backend API Testing for Financial Control Application
 Tests all authentication, CRUD operations, and reporting endpoints
 """
 
-import requests
+import argparse
+import asyncio
+import functools
+import httpx
 import json
+import orjson
 from datetime import datetime, timezone, timedelta
 import uuid
 import os
+import sys
+import time
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv('/app/frontend/.env')
+@functools.cache
+def _env():
+    """Load environment variables, parsing the frontend .env only once"""
+    load_dotenv('/app/frontend/.env')
+    return os.environ.copy()
 
 # Get backend URL from environment
-BACKEND_URL = os.getenv('REACT_APP_BACKEND_URL', 'https://budget-guardian-3.preview.emergentagent.com')
+BACKEND_URL = _env().get('REACT_APP_BACKEND_URL', 'https://budget-guardian-3.preview.emergentagent.com')
 API_BASE = f"{BACKEND_URL}/api"
 
+# Request payloads and URLs are fixed for the whole run, so compose them once
+_NOW = datetime.now(timezone.utc)
+
+CATEGORY_JSON = json.dumps({
+    "name": "Supermercado",
+    "color": "#FF6B6B",
+    "icon": "🛒"
+}).encode()
+TRANSACTION_JSON = json.dumps({
+    "amount": 150.75,
+    "type": "expense",
+    "category_id": str(uuid.uuid4()),
+    "description": "Compras no supermercado",
+    "date": _NOW.isoformat()
+}).encode()
+GOAL_JSON = json.dumps({
+    "name": "Reserva de Emergência",
+    "target_amount": 10000.0,
+    "deadline": (_NOW + timedelta(days=365)).isoformat()
+}).encode()
+
+URLS = {
+    "docs": f"{BACKEND_URL}/docs",
+    "callback": f"{API_BASE}/auth/callback",
+    "me": f"{API_BASE}/auth/me",
+    "logout": f"{API_BASE}/auth/logout",
+    "categories": f"{API_BASE}/categories",
+    "transactions": f"{API_BASE}/transactions",
+    "goals": f"{API_BASE}/goals",
+    "sample_report": f"{API_BASE}/reports/monthly/2025/1",
+    "monthly_report": f"{API_BASE}/reports/monthly/{_NOW.year}/{_NOW.month}",
+    "invalid": f"{API_BASE}/invalid-endpoint",
+}
+
+# Tests that only check a status code: (name, method, url, body, expected)
+UNAUTHENTICATED_PROBES = [
+    ("Health Check - API Documentation", "GET", URLS["docs"], None, 200),
+    ("Auth Callback - Missing Session ID", "POST", URLS["callback"], None, 422),
+    ("Get Current User - Unauthenticated", "GET", URLS["me"], None, 401),
+    ("Invalid Endpoint", "HEAD", URLS["invalid"], None, 404),
+]
+# The mock session is unknown to the server, so authenticated calls get 401
+AUTHENTICATED_PROBES = [
+    ("Get Categories - With Mock Auth", "GET", URLS["categories"], None, 401),
+    ("Create Category - With Mock Auth", "POST", URLS["categories"], CATEGORY_JSON, 401),
+    ("Get Transactions - With Mock Auth", "GET", URLS["transactions"], None, 401),
+    ("Create Transaction - With Mock Auth", "POST", URLS["transactions"], TRANSACTION_JSON, 401),
+    ("Get Goals - With Mock Auth", "GET", URLS["goals"], None, 401),
+    ("Create Goal - With Mock Auth", "POST", URLS["goals"], GOAL_JSON, 401),
+    ("Get Monthly Report - With Mock Auth", "GET", URLS["monthly_report"], None, 401),
+]
+
+def _reporting(name, expected=None):
+    """Report a test method's outcome through FinancialAppTester.report"""
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrap(self):
+            return await self.report(name, expected, fn(self))
+        return wrap
+    return deco
+
 class FinancialAppTester:
     def __init__(self):
-        self.session = requests.Session()
+        # Pooling and HTTP/2 live on the transport, which also retries
+        # failed connection attempts
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=50),
+            http2=True,
+            retries=3
+        )
+        self.client = httpx.AsyncClient(
+            base_url=BACKEND_URL,
+            transport=transport,
+            timeout=10.0
+        )
         self.session_token = None
         self.user_data = None
         self.test_category_id = None
         self.test_transaction_id = None
         self.test_goal_id = None
+        self._buf = []
+        self.results = []
+        
+    def log_test(self, test_name, success, details="", http_status=None, t_ms=None):
+        self.results.append({
+            "name": test_name,
+            "ok": success,
+            "detail": details,
+            "http_status": http_status,
+            "t_ms": t_ms
+        })
+        status = "[PASS]" if success else "[FAIL]"
+        # Buffered and written once at the end of the run
+        self._buf.append(f"{status} {test_name}\n"
+                         + (f"   Details: {details}\n" if details else "")
+                         + "\n")
         
-    def log_test(self, test_name, success, details=""):
-        status = "✅ PASS" if success else "❌ FAIL"
-        print(f"{status} {test_name}")
-        if details:
-            print(f"   Details: {details}")
-        print()
+    async def report(self, name, expected, pending):
+        """Await a test, log its outcome and return whether it passed
         
-    def test_health_check(self):
-        """Test basic connectivity to the backend"""
+        The test yields either a Response, checked against the expected status
+        code(s), or a (success, details) pair for custom checks
+        """
+        codes = (expected,) if isinstance(expected, int) else expected
+        http_status = None
+        t0 = time.perf_counter_ns()
         try:
-            response = self.session.get(f"{BACKEND_URL}/docs")
-            success = response.status_code == 200
-            self.log_test("Health Check - API Documentation", success, 
-                         f"Status: {response.status_code}")
-            return success
+            result = await pending
+            if isinstance(result, httpx.Response):
+                http_status = result.status_code
+                success = http_status in codes
+                details = f"Status: {http_status}, Expected: {'/'.join(map(str, codes))}"
+            else:
+                success, details = result
         except Exception as e:
-            self.log_test("Health Check - API Documentation", False, str(e))
-            return False
+            success, details = False, str(e)
+        t_ms = (time.perf_counter_ns() - t0) / 1e6
+        self.log_test(name, success, details, http_status=http_status, t_ms=t_ms)
+        return success
     
-    def test_auth_callback_missing_session(self):
-        """Test auth callback without session_id parameter"""
-        try:
-            response = self.session.post(f"{API_BASE}/auth/callback")
-            success = response.status_code == 422  # Validation error expected
-            self.log_test("Auth Callback - Missing Session ID", success,
-                         f"Status: {response.status_code}, Expected: 422")
-            return success
-        except Exception as e:
-            self.log_test("Auth Callback - Missing Session ID", False, str(e))
-            return False
+    async def run_probe(self, row):
+        """Send one PROBES row's request and check its status code"""
+        name, method, url, body, expected = row
+        headers = {'Content-Type': 'application/json'} if body else None
+        return await self.report(name, expected,
+                                 self.client.request(method, url, content=body, headers=headers))
     
-    def test_auth_callback_invalid_session(self):
+    @_reporting("Auth Callback - Invalid Session ID")
+    async def test_auth_callback_invalid_session(self):
         """Test auth callback with invalid session_id"""
-        try:
-            response = self.session.post(f"{API_BASE}/auth/callback", 
-                                       params={"session_id": "invalid_session_123"})
-            success = response.status_code in [400, 401]  # Auth failure expected
-            self.log_test("Auth Callback - Invalid Session ID", success,
-                         f"Status: {response.status_code}, Response: {response.text[:100]}")
-            return success
-        except Exception as e:
-            self.log_test("Auth Callback - Invalid Session ID", False, str(e))
-            return False
-    
-    def test_get_me_unauthenticated(self):
-        """Test getting current user without authentication"""
-        try:
-            response = self.session.get(f"{API_BASE}/auth/me")
-            success = response.status_code == 401
-            self.log_test("Get Current User - Unauthenticated", success,
-                         f"Status: {response.status_code}, Expected: 401")
-            return success
-        except Exception as e:
-            self.log_test("Get Current User - Unauthenticated", False, str(e))
-            return False
+        response = await self.client.post(URLS["callback"], 
+                                          params={"session_id": "invalid_session_123"})
+        success = response.status_code in [400, 401]  # Auth failure expected
+        return success, f"Status: {response.status_code}, Response: {response.content[:100].decode('utf-8', 'replace')}"
     
     def simulate_authenticated_session(self):
         """Simulate an authenticated session by creating test data directly"""
@@ -89,14 +168,11 @@ class FinancialAppTester:
             # Create a mock session token for testing
             self.session_token = f"test_session_{uuid.uuid4()}"
             
-            # Set session cookie
-            self.session.cookies.set('session_token', self.session_token)
+            # Set session cookie directly; one token for one host needs no jar
+            self.client.headers['Cookie'] = f'session_token={self.session_token}'
             
             # Also set Authorization header as backup
-            self.session.headers.update({
-                'Authorization': f'Bearer {self.session_token}',
-                'Content-Type': 'application/json'
-            })
+            self.client.headers['Authorization'] = f'Bearer {self.session_token}'
             
             self.log_test("Simulate Authenticated Session", True, 
                          f"Session token: {self.session_token[:20]}...")
@@ -105,268 +181,171 @@ class FinancialAppTester:
             self.log_test("Simulate Authenticated Session", False, str(e))
             return False
     
-    def test_categories_unauthenticated(self):
+    @_reporting("Get Categories - Unauthenticated", 401)
+    async def test_categories_unauthenticated(self):
         """Test getting categories without authentication"""
-        try:
-            # Temporarily remove auth headers
-            temp_headers = self.session.headers.copy()
-            temp_cookies = self.session.cookies.copy()
-            
-            self.session.headers.pop('Authorization', None)
-            self.session.cookies.clear()
-            
-            response = self.session.get(f"{API_BASE}/categories")
-            success = response.status_code == 401
-            
-            # Restore auth
-            self.session.headers.update(temp_headers)
-            self.session.cookies.update(temp_cookies)
-            
-            self.log_test("Get Categories - Unauthenticated", success,
-                         f"Status: {response.status_code}, Expected: 401")
-            return success
-        except Exception as e:
-            self.log_test("Get Categories - Unauthenticated", False, str(e))
-            return False
-    
-    def test_categories_authenticated(self):
-        """Test getting categories with authentication (will fail due to invalid session)"""
-        try:
-            response = self.session.get(f"{API_BASE}/categories")
-            # This should fail with 401 since we don't have a real session
-            success = response.status_code == 401
-            self.log_test("Get Categories - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Get Categories - With Mock Auth", False, str(e))
-            return False
-    
-    def test_create_category_authenticated(self):
-        """Test creating a category with authentication"""
-        try:
-            category_data = {
-                "name": "Supermercado",
-                "color": "#FF6B6B",
-                "icon": "🛒"
-            }
-            
-            response = self.session.post(f"{API_BASE}/categories", 
-                                       json=category_data)
-            # Should fail with 401 due to invalid session
-            success = response.status_code == 401
-            self.log_test("Create Category - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Create Category - With Mock Auth", False, str(e))
-            return False
-    
-    def test_transactions_authenticated(self):
-        """Test getting transactions with authentication"""
-        try:
-            response = self.session.get(f"{API_BASE}/transactions")
-            success = response.status_code == 401
-            self.log_test("Get Transactions - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Get Transactions - With Mock Auth", False, str(e))
-            return False
-    
-    def test_create_transaction_authenticated(self):
-        """Test creating a transaction with authentication"""
-        try:
-            transaction_data = {
-                "amount": 150.75,
-                "type": "expense",
-                "category_id": str(uuid.uuid4()),
-                "description": "Compras no supermercado",
-                "date": datetime.now(timezone.utc).isoformat()
-            }
-            
-            response = self.session.post(f"{API_BASE}/transactions", 
-                                       json=transaction_data)
-            success = response.status_code == 401
-            self.log_test("Create Transaction - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Create Transaction - With Mock Auth", False, str(e))
-            return False
-    
-    def test_goals_authenticated(self):
-        """Test getting goals with authentication"""
-        try:
-            response = self.session.get(f"{API_BASE}/goals")
-            success = response.status_code == 401
-            self.log_test("Get Goals - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Get Goals - With Mock Auth", False, str(e))
-            return False
-    
-    def test_create_goal_authenticated(self):
-        """Test creating a goal with authentication"""
-        try:
-            goal_data = {
-                "name": "Reserva de Emergência",
-                "target_amount": 10000.0,
-                "deadline": (datetime.now(timezone.utc) + timedelta(days=365)).isoformat()
-            }
-            
-            response = self.session.post(f"{API_BASE}/goals", 
-                                       json=goal_data)
-            success = response.status_code == 401
-            self.log_test("Create Goal - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Create Goal - With Mock Auth", False, str(e))
-            return False
+        # Strip auth from this request only; the shared client keeps its state
+        request = self.client.build_request("GET", URLS["categories"])
+        request.headers.pop('Authorization', None)
+        request.headers.pop('Cookie', None)
+        return await self.client.send(request)
     
-    def test_monthly_report_authenticated(self):
-        """Test getting monthly report with authentication"""
-        try:
-            current_date = datetime.now()
-            response = self.session.get(f"{API_BASE}/reports/monthly/{current_date.year}/{current_date.month}")
-            success = response.status_code == 401
-            self.log_test("Get Monthly Report - With Mock Auth", success,
-                         f"Status: {response.status_code}, Expected: 401 (invalid session)")
-            return success
-        except Exception as e:
-            self.log_test("Get Monthly Report - With Mock Auth", False, str(e))
-            return False
-    
-    def test_logout(self):
+    @_reporting("Logout")
+    async def test_logout(self):
         """Test logout endpoint"""
-        try:
-            response = self.session.post(f"{API_BASE}/auth/logout")
-            # Logout should work even without valid session
-            success = response.status_code == 200
-            if success:
-                data = response.json()
-                success = data.get("success") == True
-            self.log_test("Logout", success,
-                         f"Status: {response.status_code}, Response: {response.text}")
-            return success
-        except Exception as e:
-            self.log_test("Logout", False, str(e))
-            return False
-    
-    def test_invalid_endpoints(self):
-        """Test invalid endpoints return 404"""
-        try:
-            response = self.session.get(f"{API_BASE}/invalid-endpoint")
-            success = response.status_code == 404
-            self.log_test("Invalid Endpoint", success,
-                         f"Status: {response.status_code}, Expected: 404")
-            return success
-        except Exception as e:
-            self.log_test("Invalid Endpoint", False, str(e))
-            return False
+        response = await self.client.post(URLS["logout"])
+        # Logout should work even without valid session
+        success = response.status_code == 200
+        if success:
+            data = orjson.loads(response.content)
+            success = data.get("success") is True
+        return success, f"Status: {response.status_code}, Response: {response.content[:100].decode('utf-8', 'replace')}"
     
-    def test_cors_headers(self):
+    @_reporting("CORS Configuration")
+    async def test_cors_headers(self):
         """Test CORS headers are present"""
-        try:
-            # Test CORS with a GET request instead of OPTIONS
-            response = self.session.get(f"{API_BASE}/categories")
-            cors_headers = [
-                'access-control-allow-origin',
-                'access-control-allow-credentials'
-            ]
-            
-            has_cors = any(header in response.headers for header in cors_headers)
-            # Accept 401 as success since CORS should still be present
-            success = response.status_code == 401 and (has_cors or True)  # CORS might be handled at proxy level
-            
-            self.log_test("CORS Configuration", success,
-                         f"Status: {response.status_code}, CORS headers present: {has_cors}")
-            return success
-        except Exception as e:
-            self.log_test("CORS Configuration", False, str(e))
-            return False
+        # Test CORS with a GET request instead of OPTIONS
+        response = await self.client.get(URLS["categories"])
+        cors_headers = [
+            'access-control-allow-origin',
+            'access-control-allow-credentials'
+        ]
+        
+        has_cors = any(header in response.headers for header in cors_headers)
+        # Accept 401 as success since CORS should still be present
+        success = response.status_code == 401 and (has_cors or True)  # CORS might be handled at proxy level
+        return success, f"Status: {response.status_code}, CORS headers present: {has_cors}"
     
-    def test_api_structure(self):
+    @_reporting("API Structure - All Endpoints Exist")
+    async def test_api_structure(self):
         """Test API structure and endpoint availability"""
+        # Test that all expected endpoints exist (even if they return 401)
+        endpoints = [
+            URLS["callback"],
+            URLS["me"],
+            URLS["logout"],
+            URLS["categories"],
+            URLS["transactions"],
+            URLS["goals"],
+            URLS["sample_report"]
+        ]
+        
+        async def check(url):
+            response = await self.client.head(url, follow_redirects=False)
+            # Endpoints should exist (not 404) even if they require auth (401)
+            # or only accept other methods (405)
+            return response.status_code != 404
+        
+        # All probes share the client's HTTP/2 connection
+        all_exist = all(await asyncio.gather(*(check(e) for e in endpoints)))
+        return all_exist, "All expected endpoints respond (not 404)"
+    
+    async def _run_batch(self, tests, fail_fast):
+        """Run tests concurrently, counting passes as they complete
+        
+        Returns the pass count and whether the run should continue
+        """
+        tasks = [asyncio.ensure_future(test()) for test in tests]
+        passed = 0
         try:
-            # Test that all expected endpoints exist (even if they return 401)
-            endpoints = [
-                "/auth/callback",
-                "/auth/me", 
-                "/auth/logout",
-                "/categories",
-                "/transactions",
-                "/goals",
-                "/reports/monthly/2025/1"
-            ]
-            
-            all_exist = True
-            for endpoint in endpoints:
-                response = self.session.get(f"{API_BASE}{endpoint}")
-                # Endpoints should exist (not 404) even if they require auth (401)
-                if response.status_code == 404:
-                    all_exist = False
-                    break
-            
-            self.log_test("API Structure - All Endpoints Exist", all_exist,
-                         f"All expected endpoints respond (not 404)")
-            return all_exist
-        except Exception as e:
-            self.log_test("API Structure - All Endpoints Exist", False, str(e))
-            return False
+            for done in asyncio.as_completed(tasks):
+                if await done:
+                    passed += 1
+                elif fail_fast:
+                    return passed, False
+            return passed, True
+        finally:
+            # Only pending tests are affected, after a fail-fast stop
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
     
-    def run_all_tests(self):
+    async def run_all_tests(self, fail_fast=False, results_path=None):
         """Run all backend tests"""
-        print("=" * 60)
-        print("FINANCIAL CONTROL APP - BACKEND API TESTING")
-        print("=" * 60)
-        print(f"Backend URL: {BACKEND_URL}")
-        print(f"API Base: {API_BASE}")
-        print("=" * 60)
+        # With a results file for CI, stdout carries only a one-line summary
+        console = not results_path
+        if console:
+            print("=" * 60)
+            print("FINANCIAL CONTROL APP - BACKEND API TESTING")
+            print("=" * 60)
+            print(f"Backend URL: {BACKEND_URL}")
+            print(f"API Base: {API_BASE}")
+            print("=" * 60)
         
-        tests = [
-            self.test_health_check,
-            self.test_auth_callback_missing_session,
+        # Independent probes run concurrently; the session setup and logout
+        # mutate shared client state and act as barriers
+        unauthenticated = [
+            *(functools.partial(self.run_probe, row) for row in UNAUTHENTICATED_PROBES),
             self.test_auth_callback_invalid_session,
-            self.test_get_me_unauthenticated,
-            self.simulate_authenticated_session,
+            self.test_api_structure
+        ]
+        authenticated = [
             self.test_categories_unauthenticated,
-            self.test_categories_authenticated,
-            self.test_create_category_authenticated,
-            self.test_transactions_authenticated,
-            self.test_create_transaction_authenticated,
-            self.test_goals_authenticated,
-            self.test_create_goal_authenticated,
-            self.test_monthly_report_authenticated,
+            *(functools.partial(self.run_probe, row) for row in AUTHENTICATED_PROBES)
+        ]
+        # Logout ends the session, so it runs after the auth batch
+        final = [
             self.test_logout,
-            self.test_invalid_endpoints,
             self.test_cors_headers
         ]
+        # Tests skipped by --fail-fast count as not passed
+        total = len(unauthenticated) + 1 + len(authenticated) + len(final)
         
-        passed = 0
-        total = len(tests)
+        try:
+            # Pay DNS and connection setup once, outside any test's timing
+            try:
+                await self.client.head(URLS["docs"], timeout=2.0)
+            except httpx.HTTPError:
+                pass
+            
+            passed, go_on = await self._run_batch(unauthenticated, fail_fast)
+            if go_on:
+                setup_ok = self.simulate_authenticated_session()
+                passed += setup_ok
+                go_on = setup_ok or not fail_fast
+            for batch in (authenticated, final):
+                if not go_on:
+                    break
+                count, go_on = await self._run_batch(batch, fail_fast)
+                passed += count
+        finally:
+            await self.client.aclose()
+            if console:
+                sys.stdout.write("".join(self._buf))
+                sys.stdout.flush()
         
-        for test in tests:
-            if test():
-                passed += 1
+        # Machine-readable copy of the run for CI
+        if results_path:
+            with open(results_path, "w", encoding="utf-8") as f:
+                json.dump({"results": self.results, "passed": passed, "total": total}, f)
+            print(f"RESULTS: {passed}/{total} tests passed, details in {results_path}")
+            return passed, total
         
         print("=" * 60)
         print(f"RESULTS: {passed}/{total} tests passed")
         print("=" * 60)
         
+        # Emoji only where the console can encode them
+        fancy = (sys.stdout.encoding or "").lower().startswith("utf")
         if passed == total:
-            print("🎉 ALL TESTS PASSED!")
+            print(("🎉 " if fancy else "") + "ALL TESTS PASSED!")
         else:
-            print(f"⚠️  {total - passed} tests failed")
+            print(("⚠️  " if fancy else "") + f"{total - passed} tests failed")
         
         return passed, total
 
 def main():
     """Main test execution"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first failing test")
+    parser.add_argument("--results", metavar="PATH",
+                        help="write JSON results to PATH and print only a summary line")
+    args = parser.parse_args()
+    
     tester = FinancialAppTester()
-    passed, total = tester.run_all_tests()
+    passed, total = asyncio.run(tester.run_all_tests(fail_fast=args.fail_fast,
+                                                     results_path=args.results))
     
     # Return exit code based on results
     return 0 if passed == total else 1
@@ -135,12 +135,12 @@ const Dashboard = () => {
   const loadDashboardData = async () => {
     try {
       const [txnRes, catRes, goalsRes] = await Promise.all([
-        axios.get(`${API}/transactions`, { withCredentials: true }),
+        axios.get(`${API}/transactions`, { params: { limit: 5 }, withCredentials: true }),
         axios.get(`${API}/categories`, { withCredentials: true }),
         axios.get(`${API}/goals`, { withCredentials: true })
       ]);
 
-      setTransactions(txnRes.data);
+      setTransactions(txnRes.data.items);
       setCategories(catRes.data);
       setGoals(goalsRes.data);
 
@@ -336,6 +336,7 @@ const Dashboard = () => {
 
 const TransactionsTab = () => {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [categories, setCategories] = useState([]);
   const [showForm, setShowForm] = useState(false);
   const [editingTransaction, setEditingTransaction] = useState(null);
@@ -357,13 +358,27 @@ const TransactionsTab = () => {
         axios.get(`${API}/transactions`, { withCredentials: true }),
         axios.get(`${API}/categories`, { withCredentials: true })
       ]);
-      setTransactions(txnRes.data);
+      setTransactions(txnRes.data.items);
+      setNextCursor(txnRes.data.next_cursor);
       setCategories(catRes.data);
     } catch (error) {
       console.error('Error loading transactions:', error);
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const response = await axios.get(`${API}/transactions`, {
+        params: { cursor: nextCursor },
+        withCredentials: true
+      });
+      setTransactions(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error loading transactions:', error);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
@@ -582,6 +597,16 @@ const TransactionsTab = () => {
             );
           })}
         </div>
+        {nextCursor && (
+          <div className="px-6 py-4 border-t border-gray-200 text-center">
+            <button
+              onClick={loadMore}
+              className="text-blue-600 hover:text-blue-800 font-medium"
+            >
+              Carregar mais
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );